@@ -1,3 +1,6 @@
+from functools import lru_cache
+from typing import Dict, Tuple
+
 import chromadb
 from chromadb.utils import embedding_functions
 
@@ -5,6 +8,39 @@ from chromadb.utils import embedding_functions
 EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
 COLLECTION_NAME = "pii_redaction_policies"
 
+# Tipi di entità noti, per i quali pre-calcolo (alla prima ricerca semantica) l'embedding della query
+KNOWN_ENTITY_TYPES = ("EMAIL", "PHONE", "NAME", "ALL", "DEFAULT")
+
+# Istanza condivisa della funzione di embedding: il modello viene caricato una sola volta per processo.
+_EMBED_FN = None
+
+
+def _get_embed_fn():
+    """
+    Restituisce la funzione di embedding, creandola solo alla prima chiamata.
+    """
+    global _EMBED_FN
+    if _EMBED_FN is None:
+        _EMBED_FN = embedding_functions.SentenceTransformerEmbeddingFunction(
+            model_name=EMBEDDING_MODEL_NAME
+        )
+    return _EMBED_FN
+
+
+# Vettori delle query per i tipi noti, calcolati alla prima ricerca semantica e condivisi nel processo.
+_QUERY_VECS = None
+
+
+def _get_query_vecs():
+    """
+    Restituisce i vettori pre-calcolati delle query per KNOWN_ENTITY_TYPES, calcolandoli solo alla prima chiamata.
+    """
+    global _QUERY_VECS
+    if _QUERY_VECS is None:
+        query_vecs = _get_embed_fn()([PolicyVectorStore._search_query(t) for t in KNOWN_ENTITY_TYPES])
+        _QUERY_VECS = dict(zip(KNOWN_ENTITY_TYPES, query_vecs))
+    return _QUERY_VECS
+
 class PolicyVectorStore:
     """
     Gestisce il database vettoriale (ChromaDB) per l'archiviazione e il recupero
@@ -17,9 +53,8 @@ class PolicyVectorStore:
         self.client = chromadb.Client()
         
         # Imposto la funzione di embedding che trasforma il testo in vettori numerici
-        self.embedding_func = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name=EMBEDDING_MODEL_NAME
-        )
+        # (riuso il modello già caricato se esiste)
+        self.embedding_func = _get_embed_fn()
 
         # Creo la collezione o la recupero se già esiste
         self.collection = self.client.get_or_create_collection(
@@ -27,8 +62,17 @@ class PolicyVectorStore:
             embedding_function=self.embedding_func
         )
 
-        # Caricamento iniziale del corpus delle policy nel vector store
-        self._seed_knowledge_base()
+        # Caricamento iniziale del corpus delle policy nel vector store.
+        # Se la collezione è già popolata evito di ricalcolare gli embedding.
+        if self.collection.count() == 0:
+            self._seed_knowledge_base()
+
+        # Indice in memoria (customer, scope) -> policy, usato sul percorso caldo al posto della query semantica
+        self._policy_index = self._build_policy_index()
+
+        # Memoizzo la ricerca semantica: le coppie (customer_id, entity_type) si ripetono molto tra le richieste.
+        # In caso di aggiornamento delle policy va invalidata con self.search_policy.cache_clear().
+        self.search_policy = lru_cache(maxsize=256)(self.search_policy)
 
     def _seed_knowledge_base(self):
         """
@@ -70,42 +114,71 @@ class PolicyVectorStore:
         )
         print(f"Knowledge Base caricata con {len(policy_documents)} regole.")
 
+    def _build_policy_index(self) -> Dict[Tuple[str, str], Dict]:
+        """
+        Costruisce l'indice delle policy a partire dai record presenti nella collezione.
+        """
+        records = self.collection.get(include=["documents", "metadatas"])
+
+        index = {}
+        for document, metadata in zip(records["documents"], records["metadatas"]):
+            index[(metadata["customer"], metadata["scope"].upper())] = {
+                "text": document,
+                "source": metadata["source"]
+            }
+        return index
+
     def retrieve_policy(self, customer_id: str, entity_type: str):
         """
-        Esegue la RAG, cercando la regola migliore da applicare.
-        Prima cerca una regola SPECIFICA per quel Cliente e quel tipo di dato, se non trova nulla, cerca la regola GLOBALE (Fallback).
+        Cerca la regola migliore da applicare tramite l'indice in memoria.
+        Ordine di priorità: regola SPECIFICA del Cliente per quel tipo di dato, regola del Cliente valida per tutto (ALL),
+        infine la regola GLOBALE (Fallback).
+        Il tipo di entità non è case-sensitive (es. "email" equivale a "EMAIL").
         """
-        
-        # Costruisco una query semantica semplice.
-        search_query = f"Policy handling for {entity_type}"
-
-        # Filtro esplicitamente per customer_id nei metadati per evitare che le regole di un cliente contaminino quelle di un altro.
-        specific_results = self.collection.query(
-            query_texts=[search_query],
-            n_results=1,
-            where={"customer": customer_id}
+        return (
+            self._policy_index.get((customer_id, entity_type.upper()))
+            or self._policy_index.get((customer_id, "ALL"))
+            or self._policy_index.get(("GLOBAL", "DEFAULT"))
         )
 
-        # Se ho trovato un match valido per questo cliente, lo restituisco.
-        if specific_results["documents"] and specific_results["documents"][0]:
-            return {
-                "text": specific_results["documents"][0][0],
-                "source": specific_results["metadatas"][0][0]["source"]
-            }
+    @staticmethod
+    def _search_query(entity_type: str) -> str:
+        """Costruisco una query semantica semplice."""
+        return f"Policy handling for {entity_type}"
+
+    def search_policy(self, customer_id: str, entity_type: str):
+        """
+        Esegue la RAG sul vector store, cercando la regola semanticamente più vicina.
+        Prima cerca una regola SPECIFICA per quel Cliente e quel tipo di dato, se non trova nulla, cerca la regola GLOBALE (Fallback).
+        (Non usata sul percorso caldo: utile per query più libere in futuro).
+        """
+        
+        # Uso il vettore pre-calcolato se il tipo è noto, altrimenti calcolo l'embedding della query.
+        query_vec = _get_query_vecs().get(entity_type)
+        if query_vec is None:
+            query_vec = self.embedding_func([self._search_query(entity_type)])[0]
 
-        # Se arrivo a questo punto, il cliente non ha una regola specifica per questa entità.
-        # Cerco le regole GLOBAL.
-        global_results = self.collection.query(
-            query_texts=[search_query],
-            n_results=1,
-            where={"customer": "GLOBAL"}
+        # Filtro esplicitamente per customer_id (o GLOBAL) nei metadati per evitare che le regole di un cliente
+        # contaminino quelle di un altro. Un'unica query evita di calcolare due volte l'embedding.
+        # Chiedo un risultato in più rispetto alle regole GLOBAL: anche se tutte fossero più vicine,
+        # la regola migliore del cliente resta tra i risultati.
+        n_global = sum(1 for customer, _ in self._policy_index if customer == "GLOBAL")
+        results = self.collection.query(
+            query_embeddings=[query_vec],
+            n_results=1 + n_global,
+            where={"customer": {"$in": [customer_id, "GLOBAL"]}}
         )
 
-        if global_results["documents"] and global_results["documents"][0]:
-            return {
-                "text": global_results["documents"][0][0],
-                "source": global_results["metadatas"][0][0]["source"]
-            }
+        documents = results["documents"][0] if results["documents"] else []
+        metadatas = results["metadatas"][0] if results["metadatas"] else []
+
+        # Preferisco il match del cliente; se non c'è, uso la regola GLOBAL (risultati già ordinati per distanza).
+        fallback = None
+        for document, metadata in zip(documents, metadatas):
+            if metadata["customer"] == customer_id:
+                return {"text": document, "source": metadata["source"]}
+            if fallback is None and metadata["customer"] == "GLOBAL":
+                fallback = {"text": document, "source": metadata["source"]}
 
-        # caso in cui non c'è nessuna regola trovata nemmeno nel globale.
-        return None
\ No newline at end of file
+        # None nel caso in cui non c'è nessuna regola trovata nemmeno nel globale.
+        return fallback
@@ -1,5 +1,43 @@
 import hashlib
-from typing import Dict, Callable
+import re
+from enum import IntEnum
+from functools import lru_cache
+from typing import Callable, Dict, List, NamedTuple, Tuple
+
+
+class Action(IntEnum):
+    """
+    Azioni di redazione. Il valore intero è l'indice nella tabella delle strategie del RedactionEngine;
+    il nome è quello esposto nelle risposte (es. "MASK_LAST_4").
+    """
+    REDACT = 0
+    HASH = 1
+    MASK_LAST_4 = 2
+    KEEP = 3
+
+
+class Decision(NamedTuple):
+    """
+    Decisione tracciabile presa per una singola entità.
+    """
+    entity_type: str
+    original_value: str
+    redacted_value: str
+    applied_action: str
+    policy_source: str
+    justification: str
+
+
+# Keyword del Semantic Layer, compilate una sola volta (case-insensitive, quindi niente .upper() sul testo)
+_EXCEPTION_RE = re.compile(r"ECCETTO", re.IGNORECASE)
+_KEYWORD_ACTIONS = (
+    (re.compile(r"HASH", re.IGNORECASE), Action.HASH),
+    (re.compile(r"MASK|OSCURATI", re.IGNORECASE), Action.MASK_LAST_4),
+    (re.compile(r"KEEP|PUBBLICI", re.IGNORECASE), Action.KEEP),
+)
+
+# Stringa di asterischi pre-allocata: la maschera si ottiene con uno slice invece di "*" * n
+_STAR_POOL = "*" * 1024
 
 class RedactionEngine:
     """
@@ -10,13 +48,18 @@ class RedactionEngine:
     def __init__(self, vector_store):
         self.kb = vector_store
 
-        # Mappa le keyword delle policy alle funzioni Python reali.
-        self._action_strategies: Dict[str, Callable[[str], str]] = {
-            "REDACT": self._apply_redact,
-            "HASH": self._apply_hash,
-            "MASK_LAST_4": self._apply_mask_last_4,
-            "KEEP": self._apply_keep
-        }
+        # Tabella delle strategie indicizzata per Action: collega le azioni alle funzioni Python reali.
+        # L'ordine deve seguire i valori di Action.
+        self._strategies: Tuple[Callable[[str], str], ...] = (
+            self._apply_redact,
+            self._apply_hash,
+            self._apply_mask_last_4,
+            self._apply_keep
+        )
+
+        # Le decisioni (customer_id, entity_type) si ripetono molto tra le richieste: le memoizzo.
+        # In caso di aggiornamento delle policy va invalidata con self._resolve_action.cache_clear().
+        self._resolve_action = lru_cache(maxsize=128)(self._resolve_action)
 
     # Implementation Layer
 
@@ -25,19 +68,29 @@ class RedactionEngine:
         return "[REDACTED]"
 
     def _apply_hash(self, value: str) -> str:
+        """Wrapper su stringa di _apply_hash_bytes."""
+        return self._apply_hash_bytes(value.encode("utf-8"))
+
+    def _apply_hash_bytes(self, value_bytes: bytes) -> str:
         """
-        Hashing irreversibile (SHA-256). Tronca l'output per leggibilità nei log.
+        Hashing irreversibile (BLAKE2b a 4 byte, cioè 8 caratteri esadecimali per leggibilità nei log).
+        Non serve resistenza crittografica: BLAKE2b è più veloce di SHA-256 e produce direttamente l'output corto.
+        Riceve il valore già codificato in UTF-8.
         """
-        hashed = hashlib.sha256(value.encode("utf-8")).hexdigest()
-        return f"[HASH:{hashed[:8]}...]"
+        hashed = hashlib.blake2b(value_bytes, digest_size=4).hexdigest()
+        return f"[HASH:{hashed}...]"
 
     def _apply_mask_last_4(self, value: str) -> str:
         """
         Mostra solo gli ultimi 4 caratteri.
         """
-        if len(value) <= 4:
+        masked_length = len(value) - 4
+        if masked_length <= 0:
             return value
-        return "*" * (len(value) - 4) + value[-4:]
+        if masked_length > len(_STAR_POOL):
+            # valori più lunghi del pool (raro)
+            return "*" * masked_length + value[-4:]
+        return _STAR_POOL[:masked_length] + value[-4:]
 
     def _apply_keep(self, value: str) -> str:
         """Nessuna modifica"""
@@ -45,69 +98,113 @@ class RedactionEngine:
 
     # Semantic Layer
 
-    def _derive_action_from_text(self, policy_text: str, entity_type: str) -> str:
+    @staticmethod
+    @lru_cache(maxsize=128)
+    def _derive_action_from_text(policy_text: str, entity_type: str) -> Action:
         """
         Simula il componente 'Reasoning' di un LLM.
+        Il risultato dipende solo da (testo, tipo), quindi viene memoizzato: le policy sono poche.
         """
-        text_normalized = policy_text.upper()
-        # Normalizziamo anche l'input 
-        entity_upper = entity_type.upper()
-
         # Se c'è un'eccezione esplicita nel testo ("...eccetto i PHONE...")
-        if "ECCETTO" in text_normalized:
-            if entity_upper in text_normalized:
+        if _EXCEPTION_RE.search(policy_text):
+            # Normalizziamo anche l'input
+            if entity_type.upper() in policy_text.upper():
                 # eccezione (es. PHONE) -> KEEP
-                return "KEEP"
+                return Action.KEEP
             else:
-                return "REDACT"
+                return Action.REDACT
+
+        # Mapping diretto delle Keyword ( non c'è "ECCETTO"), in ordine di priorità
+        for keyword_re, action in _KEYWORD_ACTIONS:
+            if keyword_re.search(policy_text):
+                return action
 
-        # Mapping diretto delle Keyword ( non c'è "ECCETTO")
-        if "HASH" in text_normalized:
-            return "HASH"
-        
-        if "MASK" in text_normalized or "OSCURATI" in text_normalized:
-            return "MASK_LAST_4"
-        
-        if "KEEP" in text_normalized or "PUBBLICI" in text_normalized:
-            return "KEEP"
+        return Action.REDACT
 
-        return "REDACT"
+    def _resolve_action(self, customer_id: str, entity_type: str) -> Tuple[Action, str, str]:
+        """
+        Retrieval + Reasoning: restituisce (azione, fonte, giustificazione) per il cliente e il tipo di dato.
+        Non dipende dal valore dell'entità, quindi viene memoizzato per istanza (vedi __init__).
+        """
+        # Retrieval: uso del metodo retrieve_policy che gestisce già il fallback GLOBAL
+        rule_data = self.kb.retrieve_policy(customer_id, entity_type)
+
+        if not rule_data:
+            # se il DB è vuoto o irraggiungibile
+            return (
+                Action.REDACT,
+                "SYSTEM_DEFAULT",
+                "No policy found in Knowledge Base. Applying maximum safety."
+            )
+
+        # Reasoning
+        policy_text = rule_data["text"]
+        action = self._derive_action_from_text(policy_text, entity_type)
+        return action, rule_data["source"], f"Matched snippet: '{policy_text}'"
+
+    def _execute(self, action: Action, value: str) -> str:
+        """
+        Execution: recupero la funzione dalla tabella e la eseguo.
+        """
+        return self._strategies[action](value)
+
+    def _build_decision(self, entity_type: str, original_value: str, redacted_value: str,
+                        resolution: Tuple[Action, str, str]) -> Decision:
+        """
+        Costruisce la risposta tracciabile (l'azione viene serializzata con il suo nome).
+        """
+        action, policy_source, justification = resolution
+
+        return Decision(
+            entity_type=entity_type,
+            original_value=original_value,
+            redacted_value=redacted_value,
+            applied_action=action.name,
+            policy_source=policy_source,
+            justification=justification
+        )
 
     # PUBLIC API 
 
-    def process_entity(self, customer_id: str, entity_type: str, original_value: str) -> Dict:
+    def process_entity(self, customer_id: str, entity_type: str, original_value: str) -> Decision:
         """
         1. Retrieval: Cerca la regola nel Vector Store.
         2. Reasoning: Interpreta il testo per scegliere l'azione.
         3. Execution: Applica l'azione al dato.
         """
-        
-        # Retrieval: uso del metodo search_rule che gestisce già il fallback GLOBAL
-        rule_data = self.kb.retrieve_policy(customer_id, entity_type)
+        resolution = self._resolve_action(customer_id, entity_type)
+        redacted_value = self._execute(resolution[0], original_value)
 
-        if not rule_data:
-            # se il DB è vuoto o irraggiungibile
-            action_name = "REDACT"
-            policy_source = "SYSTEM_DEFAULT"
-            justification = "No policy found in Knowledge Base. Applying maximum safety."
-        else:
-            # Reasoning
-            policy_text = rule_data["text"]
-            policy_source = rule_data["source"]
-            
-            action_name = self._derive_action_from_text(policy_text, entity_type)
-            justification = f"Matched snippet: '{policy_text}'"
-
-        # Execution: recupero la funzione dalla mappa e la eseguo
-        action_function = self._action_strategies.get(action_name, self._apply_redact)
-        redacted_value = action_function(original_value)
-
-        # Costruzione della risposta tracciabile 
-        return {
-            "entity_type": entity_type,
-            "original_value": original_value,
-            "redacted_value": redacted_value,
-            "applied_action": action_name,
-            "policy_source": policy_source,
-            "justification": justification
-        }
\ No newline at end of file
+        return self._build_decision(entity_type, original_value, redacted_value, resolution)
+
+    def process_batch(self, customer_id: str, entities: List) -> List[Decision]:
+        """
+        Come process_entity, ma per tutte le entità di una richiesta.
+        Retrieval e Reasoning vengono eseguiti una sola volta per ogni tipo di entità distinto.
+        Le entità devono esporre gli attributi 'type' e 'value'; le decisioni sono restituite nello stesso ordine.
+        """
+        # Retrieval + Reasoning: una decisione per tipo, riusata da tutte le entità dello stesso tipo
+        resolutions = {
+            entity_type: self._resolve_action(customer_id, entity_type)
+            for entity_type in {entity.type for entity in entities}
+        }
+
+        # Execution: dispatch tramite la tabella delle strategie.
+        # Eccezione: per HASH codifico in UTF-8 e hasho una sola volta ogni valore distinto.
+        hashed_values: Dict[str, str] = {}
+        decisions = []
+
+        for entity in entities:
+            resolution = resolutions[entity.type]
+            action = resolution[0]
+
+            if action is Action.HASH:
+                redacted_value = hashed_values.get(entity.value)
+                if redacted_value is None:
+                    redacted_value = hashed_values[entity.value] = self._apply_hash_bytes(entity.value.encode("utf-8"))
+            else:
+                redacted_value = self._strategies[action](entity.value)
+
+            decisions.append(self._build_decision(entity.type, entity.value, redacted_value, resolution))
+
+        return decisions
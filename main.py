@@ -1,16 +1,37 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
+from contextlib import asynccontextmanager
+
+from fastapi import Body, FastAPI, HTTPException
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional
 
 # Import dei moduli locali 
 from database import PolicyVectorStore
 from logic import RedactionEngine
 
+# Tipi di entità reali usati dai client, da preparare all'avvio
+WARMUP_ENTITY_TYPES = ("EMAIL", "PHONE", "NAME")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Warm-up all'avvio, prima dell'arrivo del traffico.
+    Modello, collezione e indice delle policy vengono già caricati in modo non pigro alla costruzione
+    del Vector Store, quindi non c'è altro stato da inizializzare: qui si riempie solo la cache delle
+    decisioni del motore per i tipi di entità reali (la ricerca semantica non è sul percorso delle richieste).
+    """
+    redaction_engine.process_batch(
+        customer_id="ACME",
+        entities=[EntityItem(type=t, value="X", start=0, end=1) for t in WARMUP_ENTITY_TYPES]
+    )
+    print("Warm-up completato.")
+    yield
+
 # Inizializzazione di FastAPI
 app = FastAPI(
     title="Policy-Aware PII Redaction Service",
     description="Microservizio per l'offuscamento dinamico di dati sensibili basato su policy RAG.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # AVVIO DEL SISTEMA
@@ -23,70 +44,149 @@ redaction_engine = RedactionEngine(vector_store)
 
 print("Sistema pronto. Database caricato correttamente.")
 
-    
 # Definisce i modelli di input/output per validazione automatica
+# I modelli di richiesta sono immutabili e ignorano i campi extra.
 class EntityItem(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     type: str = Field(..., description="Tipo di entità (es. EMAIL, PHONE, NAME)")
     value: str = Field(..., description="Il testo esatto dell'entità")
     start: int = Field(..., description="Indice di inizio nel testo originale")
     end: int = Field(..., description="Indice di fine nel testo originale")
 
 class ContentData(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     text: str = Field(..., description="Il testo completo da analizzare")
     entities: List[EntityItem] = Field(..., description="Lista delle entità PII identificate")
 
 class RedactRequest(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     customer_id: str = Field(..., description="Identificativo del cliente (es. ACME)")
     policy_version: Optional[str] = Field(None, description="Versione specifica della policy (opzionale)")
     content: ContentData
 
+class ActionDetail(BaseModel):
+    """
+    Dettaglio di una decisione; viene letto direttamente dagli attributi della Decision restituita dal motore.
+    """
+    model_config = ConfigDict(from_attributes=True)
+
+    entity_type: str
+    original_value: str
+    redacted_value: str
+    applied_action: str
+    policy_source: str
+    justification: str
+
 class RedactResponse(BaseModel):
     original_text_length: int
     redacted_text: str
-    actions: List[dict]
+    actions: List[ActionDetail]
 
 # API ENDPOINTS 
 @app.post("/redact", response_model=RedactResponse)
-def redact_text(request: RedactRequest):
+async def redact_text(request: RedactRequest):
     """
     Endpoint principale: riceve testo ed entità, interroga le policy
     e restituisce il testo oscurato con le giustificazioni.
+    È async perché il percorso caldo non calcola embedding: le policy vengono risolte
+    dall'indice in memoria, quindi non serve occupare un thread del pool.
+    """
+    return _redact(request)
+
+@app.post("/redact_fast", response_model=RedactResponse)
+async def redact_text_fast(payload: dict = Body(...)):
+    """
+    Come /redact, ma senza la validazione Pydantic dell'input.
+    Da usare solo per chiamanti interni e fidati che inviano già payload nel formato corretto.
+    Il payload viene comunque controllato nella forma e nei tipi dei campi: se non è valido restituisce 400.
+    """
+    request = _construct_request(payload)
+    return _redact(request)
+
+# Messaggio fisso per /redact_fast: non espone al chiamante dettagli interni
+INVALID_PAYLOAD_DETAIL = "Payload non valido per /redact_fast."
+
+def _require(data, key: str, expected_type: type):
+    """
+    Legge data[key] verificando che sia del tipo atteso; altrimenti solleva HTTPException 400.
+    (bool è escluso per i campi int, anche se in Python ne è una sottoclasse).
+    """
+    if not isinstance(data, dict) or key not in data:
+        raise HTTPException(status_code=400, detail=INVALID_PAYLOAD_DETAIL)
+
+    value = data[key]
+    if not isinstance(value, expected_type) or (expected_type is int and isinstance(value, bool)):
+        raise HTTPException(status_code=400, detail=INVALID_PAYLOAD_DETAIL)
+    return value
+
+def _construct_request(payload: dict) -> RedactRequest:
+    """
+    Costruisce RedactRequest senza validazione Pydantic (model_construct non costruisce i modelli annidati).
+    I campi obbligatori vengono letti e controllati esplicitamente: model_construct ignorerebbe
+    quelli mancanti e accetterebbe qualsiasi tipo.
+    """
+    policy_version = payload.get("policy_version")
+    if policy_version is not None and not isinstance(policy_version, str):
+        raise HTTPException(status_code=400, detail=INVALID_PAYLOAD_DETAIL)
+
+    content = _require(payload, "content", dict)
+    entities = [
+        EntityItem.model_construct(
+            type=_require(entity, "type", str),
+            value=_require(entity, "value", str),
+            start=_require(entity, "start", int),
+            end=_require(entity, "end", int)
+        )
+        for entity in _require(content, "entities", list)
+    ]
+
+    return RedactRequest.model_construct(
+        customer_id=_require(payload, "customer_id", str),
+        policy_version=policy_version,
+        content=ContentData.model_construct(
+            text=_require(content, "text", str),
+            entities=entities
+        )
+    )
+
+def _redact(request: RedactRequest) -> dict:
+    """
+    Pipeline di redazione condivisa da /redact e /redact_fast.
     """
-    
     original_text = request.content.text
-    planned_actions = []
 
     # FASE DI ANALISI (Decision Making)
-    # Itera su ogni entità per decidere cosa farne.
+    # Decide cosa fare di ogni entità, risolvendo le policy una sola volta per tipo.
     # Non modifica ancora il testo.
-    for entity in request.content.entities:
-        decision = redaction_engine.process_entity(
-            customer_id=request.customer_id,
-            entity_type=entity.type,
-            original_value=entity.value
-        )
-        planned_actions.append(decision)
+    planned_actions = redaction_engine.process_batch(
+        customer_id=request.customer_id,
+        entities=request.content.entities
+    )
 
     # FASE DI APPLICAZIONE (Text Reconstruction)
     # Sostituisce le parti del testo originale con i valori redatti.
     
-    # Lista di tuple (entità_originale, decisione_presa)
-    replacements = list(zip(request.content.entities, planned_actions))
-
-    # Ordino le sostituzioni in ordine DECRESCENTE di posizione (start index).
-    # Se sostituisse dall'inizio, la lunghezza della stringa cambierebbe, 
-    # invalidando gli indici delle entità successive. Partendo dalla fine, gli indici precedenti rimangono validi.
-    replacements.sort(key=lambda x: x[0].start, reverse=True)
+    # Lista di tuple (entità_originale, decisione_presa), ordinate per posizione CRESCENTE (start index).
+    replacements = sorted(
+        zip(request.content.entities, planned_actions),
+        key=lambda x: x[0].start
+    )
 
-    final_text = original_text
+    # Unica passata in avanti: accumulo i segmenti [Testo Prima] + [Nuovo Valore] e li unisco alla fine,
+    # invece di ricostruire l'intera stringa ad ogni sostituzione.
+    segments = []
+    position = 0
 
     for entity, action_result in replacements:
-        start_idx = entity.start
-        end_idx = entity.end
-        new_value = action_result["redacted_value"]
+        segments.append(original_text[position:entity.start])
+        segments.append(action_result.redacted_value)
+        position = entity.end
 
-        # Slicing : [Testo Prima] + [Nuovo Valore] + [Testo Dopo]
-        final_text = final_text[:start_idx] + new_value + final_text[end_idx:]
+    segments.append(original_text[position:])
+    final_text = "".join(segments)
 
     # Costruzione della risposta finale
     return {
@@ -145,9 +245,9 @@ def explain_policy_decision(request: ExplainRequest):
         original_value="X"  # Dummy value
     )
 
-    # Convertiamo il dizionario interno restituito dal motore nel modello Pydantic di risposta.
+    # Convertiamo la Decision restituita dal motore nel modello Pydantic di risposta.
     return {
-        "action": decision["applied_action"],
-        "source": decision["policy_source"],
-        "snippet": decision["justification"]
+        "action": decision.applied_action,
+        "source": decision.policy_source,
+        "snippet": decision.justification
     }
\ No newline at end of file
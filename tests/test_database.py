@@ -0,0 +1,162 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+
+# Aggiunge la directory al system path per poter importare 'database'.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from database import PolicyVectorStore
+except ImportError:  # chromadb non installato
+    PolicyVectorStore = None
+
+
+# Record restituiti dalla finta collezione ChromaDB
+POLICY_RECORDS = {
+    "documents": ["Regola globale: REDACT.", "Le EMAIL usano HASH.", "Tutto REDACT, eccetto i PHONE."],
+    "metadatas": [
+        {"customer": "GLOBAL", "scope": "DEFAULT", "source": "POL-GLOBAL"},
+        {"customer": "ACME",   "scope": "EMAIL",   "source": "POL-ACME-V2"},
+        {"customer": "BETA",   "scope": "ALL",     "source": "POL-BETA-GEN"}
+    ]
+}
+
+
+def _build_store(existing_count):
+    """
+    Costruisce lo store con un finto client ChromaDB, su una collezione che contiene già 'existing_count' record.
+    Il modello di embedding non viene caricato.
+    """
+    client = MagicMock()
+    collection = client.get_or_create_collection.return_value
+    collection.count.return_value = existing_count
+    collection.get.return_value = POLICY_RECORDS
+
+    with patch("database.chromadb.Client", return_value=client), patch("database._get_embed_fn"):
+        store = PolicyVectorStore()
+    return store, collection
+
+
+@unittest.skipIf(PolicyVectorStore is None, "chromadb non installato")
+class TestPolicyVectorStoreInit(unittest.TestCase):
+    """
+    Verifica il costruttore con un finto client ChromaDB e senza caricare il modello di embedding.
+    """
+
+    def test_seeds_empty_collection(self):
+        """Collezione vuota --> il corpus delle policy viene caricato."""
+        _, collection = _build_store(existing_count=0)
+
+        collection.add.assert_called_once()
+        self.assertEqual(len(collection.add.call_args.kwargs["documents"]), 5)
+
+    def test_skips_seed_when_populated(self):
+        """Collezione già popolata --> nessun nuovo caricamento (e nessun ricalcolo degli embedding)."""
+        _, collection = _build_store(existing_count=5)
+
+        collection.add.assert_not_called()
+
+    def test_no_embedding_at_construction(self):
+        """La costruzione non esegue il modello: i vettori delle query si calcolano alla prima ricerca semantica."""
+        with patch("database._get_query_vecs") as query_vecs:
+            _build_store(existing_count=5)
+
+        query_vecs.assert_not_called()
+
+    def test_index_built_from_collection(self):
+        """L'indice in memoria viene costruito dai record presenti nella collezione."""
+        store, collection = _build_store(existing_count=5)
+
+        collection.get.assert_called_once()
+        self.assertEqual(store.retrieve_policy("BETA", "PHONE")["source"], "POL-BETA-GEN")
+
+
+@unittest.skipIf(PolicyVectorStore is None, "chromadb non installato")
+class TestPolicyIndex(unittest.TestCase):
+    """
+    Verifica la gerarchia di retrieval sull'indice in memoria, senza caricare il modello di embedding.
+    """
+
+    def setUp(self):
+        """
+        Costruisce lo store saltando __init__ e simula la collezione ChromaDB con un Mock.
+        """
+        self.store = PolicyVectorStore.__new__(PolicyVectorStore)
+        self.store.collection = MagicMock()
+        self.store.collection.get.return_value = POLICY_RECORDS
+        self.store._policy_index = self.store._build_policy_index()
+
+    def test_specific_rule_has_priority(self):
+        """Regola specifica del cliente per quel tipo di entità."""
+        self.assertEqual(self.store.retrieve_policy("ACME", "EMAIL")["source"], "POL-ACME-V2")
+
+    def test_customer_all_rule(self):
+        """Nessuna regola specifica, ma il cliente ha una regola valida per tutto (ALL)."""
+        self.assertEqual(self.store.retrieve_policy("BETA", "EMAIL")["source"], "POL-BETA-GEN")
+
+    def test_global_fallback(self):
+        """Né regola specifica né ALL --> fallback GLOBAL, anche per clienti sconosciuti."""
+        self.assertEqual(self.store.retrieve_policy("ACME", "PHONE")["source"], "POL-GLOBAL")
+        self.assertEqual(self.store.retrieve_policy("UNKNOWN_CLIENT", "EMAIL")["source"], "POL-GLOBAL")
+
+    def test_entity_type_is_case_insensitive(self):
+        """Il tipo di entità in minuscolo deve trovare la stessa regola."""
+        self.assertEqual(self.store.retrieve_policy("ACME", "email")["source"], "POL-ACME-V2")
+
+@unittest.skipIf(PolicyVectorStore is None, "chromadb non installato")
+class TestSemanticSearch(unittest.TestCase):
+    """
+    Verifica search_policy simulando i risultati di collection.query.
+    """
+
+    def setUp(self):
+        self.store, self.collection = _build_store(existing_count=5)
+
+        # Evito di calcolare (e di condividere tra i test) i vettori delle query
+        query_vecs_patch = patch("database._get_query_vecs", return_value={"EMAIL": [0.0]})
+        query_vecs_patch.start()
+        self.addCleanup(query_vecs_patch.stop)
+
+    def _query_returns(self, *rows):
+        """Imposta i risultati (documento, customer, source) già ordinati per distanza."""
+        self.collection.query.return_value = {
+            "documents": [[document for document, _, _ in rows]],
+            "metadatas": [[{"customer": customer, "source": source} for _, customer, source in rows]]
+        }
+
+    def test_customer_match_preferred_over_closer_global(self):
+        """La regola del cliente vince anche se la GLOBAL è più vicina."""
+        self._query_returns(("Regola globale", "GLOBAL", "POL-GLOBAL"), ("Le EMAIL usano HASH.", "ACME", "POL-ACME-V2"))
+
+        self.assertEqual(self.store.search_policy("ACME", "EMAIL")["source"], "POL-ACME-V2")
+
+        # Una sola query, filtrata su cliente e GLOBAL, con spazio per tutte le regole GLOBAL + 1
+        query_kwargs = self.collection.query.call_args.kwargs
+        self.assertEqual(query_kwargs["where"], {"customer": {"$in": ["ACME", "GLOBAL"]}})
+        self.assertEqual(query_kwargs["n_results"], 2)
+
+    def test_global_only(self):
+        """Nessuna regola del cliente --> fallback GLOBAL."""
+        self._query_returns(("Regola globale", "GLOBAL", "POL-GLOBAL"))
+
+        self.assertEqual(self.store.search_policy("UNKNOWN_CLIENT", "EMAIL")["source"], "POL-GLOBAL")
+
+    def test_empty_results(self):
+        """Nessun risultato --> None."""
+        self._query_returns()
+
+        self.assertIsNone(self.store.search_policy("ACME", "EMAIL"))
+
+    def test_results_are_memoized(self):
+        """Stessa coppia (cliente, tipo) --> una sola query al vector store."""
+        self._query_returns(("Le EMAIL usano HASH.", "ACME", "POL-ACME-V2"))
+
+        self.store.search_policy("ACME", "EMAIL")
+        self.store.search_policy("ACME", "EMAIL")
+
+        self.collection.query.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
+from types import SimpleNamespace
 import sys
 import os
 
@@ -42,13 +43,13 @@ class TestRedactionEngine(unittest.TestCase):
         result = self.engine.process_entity("ACME", "EMAIL", "mario@acme.com")
 
         # Controlliamo che la strategia scelta sia 'HASH'.
-        self.assertEqual(result["applied_action"], "HASH")
+        self.assertEqual(result.applied_action, "HASH")
         
         # Controlliamo che il valore sia stato trasformato (deve iniziare con il prefisso dell'hash).
-        self.assertTrue(result["redacted_value"].startswith("[HASH:"))
+        self.assertTrue(result.redacted_value.startswith("[HASH:"))
         
         # Controlliamo che la giustificazione deve citare il testo della policy mockata.
-        self.assertIn("Le EMAIL devono essere convertite", result["justification"])
+        self.assertIn("Le EMAIL devono essere convertite", result.justification)
 
     def test_masking_strategy_phone(self):
         """
@@ -64,9 +65,9 @@ class TestRedactionEngine(unittest.TestCase):
         result = self.engine.process_entity("ACME", "PHONE", "333-123456")
 
         # Verifichiamo che l'azione sia corretta
-        self.assertEqual(result["applied_action"], "MASK_LAST_4")
+        self.assertEqual(result.applied_action, "MASK_LAST_4")
         # Verifichiamo il risultato esatto (ultime 4 cifre visibili)
-        self.assertEqual(result["redacted_value"], "******3456")
+        self.assertEqual(result.redacted_value, "******3456")
 
     def test_exception_logic_beta(self):
         """
@@ -82,14 +83,14 @@ class TestRedactionEngine(unittest.TestCase):
 
         # Test sull'eccezione (PHONE -> KEEP)
         result_phone = self.engine.process_entity("BETA", "PHONE", "333-55555")
-        self.assertEqual(result_phone["applied_action"], "KEEP")
-        self.assertEqual(result_phone["redacted_value"], "333-55555") # Il dato deve rimanere in chiaro
+        self.assertEqual(result_phone.applied_action, "KEEP")
+        self.assertEqual(result_phone.redacted_value, "333-55555") # Il dato deve rimanere in chiaro
 
         # Test su un altro tipo (EMAIL) che NON è nell'eccezione (-> REDACT)
         # Anche se la policy è la stessa, il motore deve capire che 'EMAIL' non è 'PHONE'.
         result_email = self.engine.process_entity("BETA", "EMAIL", "test@beta.com")
-        self.assertEqual(result_email["applied_action"], "REDACT")
-        self.assertEqual(result_email["redacted_value"], "[REDACTED]")
+        self.assertEqual(result_email.applied_action, "REDACT")
+        self.assertEqual(result_email.redacted_value, "[REDACTED]")
 
     def test_fallback_when_no_policy_found(self):
         """
@@ -102,10 +103,106 @@ class TestRedactionEngine(unittest.TestCase):
         result = self.engine.process_entity("UNKNOWN_CLIENT", "EMAIL", "segreto@test.com")
 
         # Deve applicare la protezione massima
-        self.assertEqual(result["applied_action"], "REDACT")
+        self.assertEqual(result.applied_action, "REDACT")
         # La fonte deve indicare che è un default di sistema
-        self.assertEqual(result["policy_source"], "SYSTEM_DEFAULT")
-        self.assertEqual(result["redacted_value"], "[REDACTED]")
+        self.assertEqual(result.policy_source, "SYSTEM_DEFAULT")
+        self.assertEqual(result.redacted_value, "[REDACTED]")
+
+    def test_batch_resolves_each_type_once(self):
+        """
+        Richiesta con più entità dello stesso tipo --> verificare che la policy venga recuperata una sola volta per tipo
+        e che le decisioni restino nell'ordine delle entità.
+        """
+        policies = {
+            "EMAIL": {"text": "Le EMAIL devono essere convertite usando HASH.", "source": "POL-TEST-ACME"},
+            "PHONE": {"text": "I numeri devono essere parzialmente oscurati.", "source": "POL-TEST-ACME"}
+        }
+        self.mock_vector_store.retrieve_policy.side_effect = lambda customer_id, entity_type: policies[entity_type]
+
+        entities = [
+            SimpleNamespace(type="EMAIL", value="mario@acme.com"),
+            SimpleNamespace(type="PHONE", value="333-123456"),
+            SimpleNamespace(type="EMAIL", value="luigi@acme.com")
+        ]
+
+        results = self.engine.process_batch("ACME", entities)
+
+        # Una sola chiamata al DB per ciascun tipo distinto
+        requested_types = [c.args[1] for c in self.mock_vector_store.retrieve_policy.call_args_list]
+        self.assertEqual(sorted(requested_types), ["EMAIL", "PHONE"])
+
+        self.assertEqual([r.applied_action for r in results], ["HASH", "MASK_LAST_4", "HASH"])
+        self.assertEqual(results[1].redacted_value, "******3456")
+        self.assertEqual(results[2].original_value, "luigi@acme.com")
+
+    def test_batch_matches_single_entity_processing(self):
+        """
+        Batch misto con tutte le azioni --> verificare che l'esecuzione batch dia gli stessi risultati di process_entity.
+        """
+        policies = {
+            "NAME": {"text": "I NAME sono considerati pubblici, quindi KEEP.", "source": "POL-TEST"},
+            "EMAIL": {"text": "Le EMAIL devono essere convertite usando HASH.", "source": "POL-TEST"},
+            "PHONE": {"text": "I numeri devono essere parzialmente oscurati.", "source": "POL-TEST"},
+            "IBAN": {"text": "Se non viene trovata alcuna regola specifica, applicare REDACT.", "source": "POL-GLOBAL"}
+        }
+        self.mock_vector_store.retrieve_policy.side_effect = lambda customer_id, entity_type: policies[entity_type]
+
+        entities = [
+            SimpleNamespace(type="NAME", value="Mario Rossi"),
+            SimpleNamespace(type="EMAIL", value="mario@acme.com"),
+            SimpleNamespace(type="PHONE", value="333-123456"),
+            SimpleNamespace(type="IBAN", value="IT60X0542811101000000123456"),
+            SimpleNamespace(type="EMAIL", value="mario@acme.com")
+        ]
+
+        results = self.engine.process_batch("ACME", entities)
+        expected = [self.engine.process_entity("ACME", e.type, e.value) for e in entities]
+
+        self.assertEqual(results, expected)
+        self.assertEqual(
+            [r.applied_action for r in results],
+            ["KEEP", "HASH", "MASK_LAST_4", "REDACT", "HASH"]
+        )
+
+    def test_decision_cached_across_calls(self):
+        """
+        Stesso cliente e tipo di entità in chiamate successive --> verificare che la policy venga recuperata una sola volta.
+        """
+        self.mock_vector_store.retrieve_policy.return_value = {
+            "text": "Le EMAIL devono essere convertite usando HASH.",
+            "source": "POL-TEST-ACME"
+        }
+
+        first = self.engine.process_entity("ACME", "EMAIL", "mario@acme.com")
+        second = self.engine.process_entity("ACME", "EMAIL", "luigi@acme.com")
+
+        self.mock_vector_store.retrieve_policy.assert_called_once_with("ACME", "EMAIL")
+        self.assertEqual(second.applied_action, "HASH")
+        # Il valore redatto dipende comunque dal dato originale
+        self.assertNotEqual(first.redacted_value, second.redacted_value)
+
+    def test_batch_hashes_each_distinct_value_once(self):
+        """
+        Stesso valore ripetuto sotto HASH --> verificare che venga codificato e hashato una sola volta per batch.
+        """
+        self.mock_vector_store.retrieve_policy.return_value = {
+            "text": "Le EMAIL devono essere convertite usando HASH.",
+            "source": "POL-TEST-ACME"
+        }
+
+        entities = [
+            SimpleNamespace(type="EMAIL", value="mario@acme.com"),
+            SimpleNamespace(type="EMAIL", value="luigi@acme.com"),
+            SimpleNamespace(type="EMAIL", value="mario@acme.com")
+        ]
+
+        with patch.object(self.engine, "_apply_hash_bytes", wraps=self.engine._apply_hash_bytes) as hash_spy:
+            results = self.engine.process_batch("ACME", entities)
+
+        # Due valori distinti --> due hash
+        self.assertEqual(hash_spy.call_count, 2)
+        self.assertEqual(results[0], results[2])
+        self.assertNotEqual(results[0], results[1])
 
 if __name__ == '__main__':
     # Avvia l'esecuzione di tutti i test definiti nella classe
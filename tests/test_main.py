@@ -0,0 +1,153 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+
+# Aggiunge la directory al system path per poter importare 'main'.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logic import RedactionEngine
+
+try:
+    from fastapi.testclient import TestClient
+
+    # Evito di caricare il vero Vector Store (e il modello di embedding) all'import di main.
+    with patch("database.PolicyVectorStore"):
+        import main
+except ImportError:  # fastapi o chromadb non installati
+    main = None
+
+ACME_POLICIES = {
+    "EMAIL": {"text": "Le EMAIL devono essere convertite usando HASH.", "source": "POL-ACME-V2"},
+    "PHONE": {"text": "I numeri di PHONE devono essere parzialmente oscurati.", "source": "POL-ACME-V2"},
+    "NAME": {"text": "I NAME sono considerati pubblici, quindi KEEP.", "source": "POL-ACME-V2"}
+}
+
+TEXT = "L'utente Mario Rossi (mario@acme.com) ha chiamato il 333-123456."
+
+
+@unittest.skipIf(main is None, "fastapi o chromadb non installati")
+class TestRedactEndpoint(unittest.TestCase):
+    """
+    Verifica gli endpoint HTTP usando un Mock al posto del Vector Store.
+    """
+
+    def setUp(self):
+        """
+        Sostituisce il motore dell'app con uno che usa il finto database.
+        """
+        self.mock_vector_store = MagicMock()
+        self.mock_vector_store.retrieve_policy.side_effect = (
+            lambda customer_id, entity_type: ACME_POLICIES[entity_type]
+        )
+
+        engine_patch = patch.object(main, "redaction_engine", RedactionEngine(self.mock_vector_store))
+        engine_patch.start()
+        self.addCleanup(engine_patch.stop)
+
+        self.client = TestClient(main.app)
+
+    def test_reconstruction_with_unordered_entities(self):
+        """
+        Entità fornite fuori ordine e valori redatti di lunghezza diversa --> il testo viene ricostruito correttamente.
+        """
+        payload = {
+            "customer_id": "ACME",
+            "content": {
+                "text": TEXT,
+                "entities": [
+                    {"type": "PHONE", "value": "333-123456", "start": 53, "end": 63},
+                    {"type": "EMAIL", "value": "mario@acme.com", "start": 22, "end": 36},
+                    {"type": "NAME", "value": "Mario Rossi", "start": 9, "end": 20}
+                ]
+            }
+        }
+
+        response = self.client.post("/redact", json=payload)
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(
+            body["redacted_text"],
+            "L'utente Mario Rossi ([HASH:c7b1a255...]) ha chiamato il ******3456."
+        )
+        self.assertEqual(body["original_text_length"], len(TEXT))
+        # Le azioni restano nell'ordine delle entità della richiesta
+        self.assertEqual([a["applied_action"] for a in body["actions"]], ["MASK_LAST_4", "HASH", "KEEP"])
+
+    def test_startup_warms_decision_cache(self):
+        """
+        Avvio dell'app --> le decisioni per i tipi di entità reali vengono risolte prima del traffico.
+        """
+        with TestClient(main.app):
+            pass
+
+        requested = sorted(c.args for c in self.mock_vector_store.retrieve_policy.call_args_list)
+        self.assertEqual(requested, [("ACME", "EMAIL"), ("ACME", "NAME"), ("ACME", "PHONE")])
+
+    def _fast_payload(self, **entity_overrides):
+        """Payload valido per /redact_fast, con un'unica entità EMAIL eventualmente modificata."""
+        entity = {"type": "EMAIL", "value": "mario@acme.com", "start": 22, "end": 36}
+        entity.update(entity_overrides)
+        return {"customer_id": "ACME", "content": {"text": TEXT, "entities": [entity]}}
+
+    def test_redact_fast_matches_redact(self):
+        """
+        Payload corretto --> /redact_fast deve restituire la stessa risposta di /redact.
+        """
+        payload = self._fast_payload()
+
+        fast_response = self.client.post("/redact_fast", json=payload)
+
+        self.assertEqual(fast_response.status_code, 200)
+        self.assertEqual(fast_response.json(), self.client.post("/redact", json=payload).json())
+
+    def test_redact_fast_missing_top_level_key(self):
+        """Manca customer_id --> 400."""
+        payload = self._fast_payload()
+        del payload["customer_id"]
+
+        self.assertEqual(self.client.post("/redact_fast", json=payload).status_code, 400)
+
+    def test_redact_fast_missing_entity_key(self):
+        """Entità senza start/end --> 400 (non 500)."""
+        payload = self._fast_payload()
+        del payload["content"]["entities"][0]["start"]
+        del payload["content"]["entities"][0]["end"]
+
+        self.assertEqual(self.client.post("/redact_fast", json=payload).status_code, 400)
+
+    def test_redact_fast_wrong_index_type(self):
+        """Indice passato come stringa --> 400 (non 500)."""
+        payload = self._fast_payload(start="22")
+
+        self.assertEqual(self.client.post("/redact_fast", json=payload).status_code, 400)
+
+    def test_redact_fast_wrong_value_type(self):
+        """Valore non stringa sotto HASH --> 400 (non 500)."""
+        payload = self._fast_payload(value=12345)
+
+        self.assertEqual(self.client.post("/redact_fast", json=payload).status_code, 400)
+
+    def test_redact_fast_wrong_value_type_under_redact(self):
+        """Valore non stringa sotto REDACT --> 400 come per le altre azioni, con messaggio fisso."""
+        self.mock_vector_store.retrieve_policy.side_effect = None
+        self.mock_vector_store.retrieve_policy.return_value = {"text": "Applicare REDACT.", "source": "POL-GLOBAL"}
+
+        response = self.client.post("/redact_fast", json=self._fast_payload(value=12345))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["detail"], main.INVALID_PAYLOAD_DETAIL)
+
+    def test_redact_fast_internal_error_is_not_a_client_error(self):
+        """Errore interno del motore --> 500, non 400."""
+        client = TestClient(main.app, raise_server_exceptions=False)
+
+        with patch.object(main.redaction_engine, "process_batch", side_effect=KeyError("internal")):
+            response = client.post("/redact_fast", json=self._fast_payload())
+
+        self.assertEqual(response.status_code, 500)
+
+if __name__ == '__main__':
+    unittest.main()